@@ -0,0 +1,17 @@
+import os
+from src import limits
+
+# Loaded automatically by gunicorn from the working directory (Procfile / Dockerfile)
+
+# Threaded workers, so concurrent requests share one process and its LLM batcher; with the
+# sync worker each process handles one request at a time and LLM calls can never be packed
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Recycle each worker after this many requests (0 disables), with jitter so they don't all restart at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max(1, max_requests // 10) if max_requests else 0
+
+# Per-worker resource guards (WORKER_MAX_RSS_MB recycling, WORKER_MAX_MEMORY_MB address-space cap)
+def post_fork(server, worker):
+    limits.enable_worker_guards()
@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Add src/ to path to import the classifier without going through Flask
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.extractor import extract_text
+from src.sniff import sniff_file
+
+ALLOWED_EXTENSIONS = {"pdf", "png", "jpg", "jpeg", "docx", "xlsx"}
+METHODS = {"filename", "model", "llm"}
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Collect classifiable files under a directory tree
+def walk_files(root: str) -> list[str]:
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for fname in sorted(filenames):
+            if "." in fname and fname.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS:
+                paths.append(os.path.join(dirpath, fname))
+    return sorted(paths)
+
+# Read file paths from a manifest (one path per line, '#' comments allowed)
+def read_manifest(manifest_path: str) -> list[str]:
+    with open(manifest_path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+# Load (path, method) pairs already classified successfully so a rerun resumes where it left off;
+# files whose record is an error (e.g. an LLM timeout), or that were classified with another
+# method, are (re)classified
+def load_checkpoint(output_path: str) -> set[tuple[str, str]]:
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A crash can leave a truncated final line; that file is simply redone
+                continue
+            if "file_class" in record:
+                done.add((record["path"], record.get("method")))
+    return done
+
+# Drop a partial final line left by a crash so appended records stay valid JSONL
+def repair_output(output_path: str):
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+# Classify a single file on disk (runs inside a worker process)
+def classify_path(path: str, method: str) -> dict:
+    from src import classifier
+
+    start = time.perf_counter()
+    filename = os.path.basename(path)
+    try:
+        if method == "filename":
+            result = {"label": classifier.classify_by_filename(filename)}
+        else:
+            kind = sniff_file(path)
+            if kind is None:
+                raise ValueError("Unsupported file content. Expected PDF, PNG, JPEG, DOCX or XLSX.")
+            text = extract_text(path, kind=kind).lower()
+            if method == "model":
+                if classifier.pretrained_model is None:
+                    raise RuntimeError("Model not loaded. Ensure 'model/document_classifier.pkl' exists.")
+                result = classifier.classify_by_model(text, filename, model=classifier.pretrained_model)
+            else:
+                result = classifier.classify_by_llm(text, filename)
+        record = {"path": path, "method": method, "file_class": result}
+    except Exception as e:
+        record = {"path": path, "method": method, "error": str(e)}
+    record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return record
+
+# Print a single-line live throughput summary
+def print_progress(done: int, total: int, errors: int, start: float, final: bool = False):
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    rate = done / elapsed
+    remaining = (total - done) / rate if rate > 0 else float("inf")
+    line = (
+        f"\r{done}/{total} files | {rate:.1f} files/s | "
+        f"{errors} errors | elapsed {elapsed:.0f}s | eta {remaining:.0f}s"
+    )
+    print(line, end="\n" if final else "", file=sys.stderr, flush=True)
+
+# Classify every pending path with a process pool, appending JSONL as results complete
+def classify_paths(paths: list[str], output_path: str, method: str = "model", workers: int = DEFAULT_WORKERS) -> dict:
+    if method not in METHODS:
+        raise ValueError(f"Unsupported method: {method}")
+
+    repair_output(output_path)
+    done = load_checkpoint(output_path)
+    unique_paths = list(dict.fromkeys(paths))
+    pending = [p for p in unique_paths if (p, method) not in done]
+    skipped = len(unique_paths) - len(pending)
+    if skipped:
+        print(f"Resuming: {skipped} files already classified in {output_path}", file=sys.stderr)
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    completed = errors = 0
+    start = time.perf_counter()
+    with open(output_path, "a") as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(classify_path, p, method) for p in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            # Flush each line so the output file doubles as the checkpoint
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            completed += 1
+            errors += "error" in record
+            print_progress(completed, len(pending), errors, start)
+    print_progress(completed, len(pending), errors, start, final=True)
+
+    return {"classified": completed - errors, "errors": errors, "skipped": skipped}
+
+# CLI entry point
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-classify documents and stream results to JSONL.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="Directory tree to walk for documents")
+    source.add_argument("--manifest", help="Text file listing one document path per line")
+    parser.add_argument("--output", required=True, help="JSONL output path (also used as the resume checkpoint)")
+    parser.add_argument("--method", default="model", choices=sorted(METHODS), help="Classification method")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of worker processes")
+
+    args = parser.parse_args()
+    paths = walk_files(args.dir) if args.dir else read_manifest(args.manifest)
+    summary = classify_paths(paths, args.output, method=args.method, workers=args.workers)
+    print(json.dumps(summary))
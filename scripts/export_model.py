@@ -0,0 +1,69 @@
+import argparse
+import os
+import random
+import sys
+import time
+import joblib
+import pandas as pd
+
+# Add src/ to path to import the compact model format
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.compact_model import CompactModel, export_model, verify_model
+from src.extractor import extract_text
+
+MODEL_PATH = os.path.join("model", "document_classifier.pkl")
+COMPACT_MODEL_PATH = os.path.join("model", "document_classifier")
+FILES_ROOT = "files"
+NUM_PROBES = 200
+
+# Build verification inputs: real documents under files/ plus random bags of vocabulary terms
+def verification_samples(pipeline, files_root: str = FILES_ROOT, num_probes: int = NUM_PROBES) -> pd.DataFrame:
+    rows = []
+    if os.path.isdir(files_root):
+        for fname in sorted(os.listdir(files_root)):
+            path = os.path.join(files_root, fname)
+            if not os.path.isfile(path) or fname.endswith(".csv"):
+                continue
+            try:
+                text = extract_text(path).lower()
+            except Exception:
+                continue
+            rows.append({"filename": fname.lower().replace("_", " "), "text": text})
+
+    rng = random.Random(0)
+    vocabularies = {
+        column: list(vectorizer.vocabulary_)
+        for _, vectorizer, column in pipeline.named_steps["features"].transformers_
+        if vectorizer != "drop"
+    }
+    for _ in range(num_probes):
+        rows.append({
+            column: " ".join(rng.choices(terms, k=rng.randint(0, 40)))
+            for column, terms in vocabularies.items()
+        })
+    return pd.DataFrame(rows)
+
+# Export the pickled pipeline to the compact format and verify it predicts identically
+def export_and_verify(model_path: str = MODEL_PATH, output_path: str = COMPACT_MODEL_PATH, dtype: str = "float32"):
+    pipeline = joblib.load(model_path)
+    export_model(pipeline, output_path, dtype=dtype)
+
+    start = time.perf_counter()
+    compact = CompactModel.load(output_path)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    samples = verification_samples(pipeline)
+    atol = 1e-3 if dtype == "float16" else 1e-6
+    max_diff = verify_model(pipeline, compact, samples, atol=atol)
+    print(f"✅ Compact model saved to {output_path} (loads in {load_ms:.1f}ms)")
+    print(f"Verified {len(samples)} samples: identical labels, max probability difference {max_diff:.2e}")
+
+# CLI entry point
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the trained pipeline to the compact model format.")
+    parser.add_argument("--model", default=MODEL_PATH, help="Pickled sklearn pipeline to export")
+    parser.add_argument("--output", default=COMPACT_MODEL_PATH, help="Directory for the compact artifact")
+    parser.add_argument("--float16", action="store_true", help="Store weights as float16 (smaller, ~1e-3 precision)")
+
+    args = parser.parse_args()
+    export_and_verify(args.model, args.output, dtype="float16" if args.float16 else "float32")
@@ -13,12 +13,14 @@ from sklearn.compose import ColumnTransformer
 # Add src/ to path to import extract_text
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from src.extractor import extract_text
+from src.compact_model import CompactModel, export_model, verify_model
 
 # Define paths
 FILES_ROOT = "files"
 SYNTHETIC_DIR = os.path.join(FILES_ROOT, "synthetic")
 TRAIN_CSV_PATH = os.path.join(FILES_ROOT, "train_labels.csv")
 MODEL_PATH = os.path.join("model", "document_classifier.pkl")
+COMPACT_MODEL_PATH = os.path.join("model", "document_classifier")
 
 # Load and preprocess the dataset
 df = pd.read_csv(TRAIN_CSV_PATH)
@@ -109,3 +111,8 @@ else:
 os.makedirs("model", exist_ok=True)
 joblib.dump(model, MODEL_PATH)
 print(f"\nModel saved to {MODEL_PATH}")
+
+# Export the compact, memory-mappable copy the server loads, checked against the pipeline
+export_model(model, COMPACT_MODEL_PATH)
+verify_model(model, CompactModel.load(COMPACT_MODEL_PATH), X_df)
+print(f"Compact model saved to {COMPACT_MODEL_PATH}")
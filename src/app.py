@@ -1,17 +1,31 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Request, request, jsonify, send_from_directory
 from scripts import generate_synthetic_docs
 import scripts.add_category as ac
-from src.classifier import classify_file
+from src.classifier import classify_file, CLASSIFY_DEADLINE_SECONDS
+from src.deadline import Deadline
+from src import limits
+from src.limits import ResourceLimitExceeded
+from src.sniff import SniffedUpload, UnsupportedFileType
+from werkzeug.exceptions import RequestEntityTooLarge
 import logging
+import math
 import os
 import pandas as pd
 from flask_cors import CORS
 from werkzeug.datastructures import FileStorage
 from time import sleep
 
+# Sniff and hash uploaded files as the multipart body streams in, instead of spooling them first
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SniffedUpload(filename)
+
 # Setting up Flask server
 app = Flask(__name__)
+app.request_class = UploadRequest
 CORS(app, origins=["https://jackbrand900.github.io"], supports_credentials=True)
+# Werkzeug enforces this while the request body streams in, before anything reaches disk
+app.config["MAX_CONTENT_LENGTH"] = limits.MAX_UPLOAD_BYTES or None
 
 # Constants
 FILES_ROOT = "files"
@@ -25,6 +39,43 @@ logger = logging.getLogger(__name__)
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Optional per-request time budget in seconds, never longer than the server default
+def parse_deadline(value):
+    if value is None or value == "":
+        return None
+    seconds = float(value)
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError("deadline must be a positive, finite number of seconds")
+    return Deadline(min(seconds, CLASSIFY_DEADLINE_SECONDS))
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    return jsonify({"error": f"Upload exceeds {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+
+@app.errorhandler(ResourceLimitExceeded)
+def resource_limit_exceeded(e):
+    return jsonify({"error": str(e)}), e.status
+
+@app.errorhandler(UnsupportedFileType)
+def unsupported_file_type(e):
+    return jsonify({"error": str(e)}), 415
+
+# A request that hit the worker's RLIMIT_AS (WORKER_MAX_MEMORY_MB) is too large to process here
+@app.errorhandler(MemoryError)
+def out_of_memory(e):
+    logger.error("Request exceeded the worker memory limit", exc_info=True)
+    response = jsonify({"error": "Input is too large to process within the worker memory limit"})
+    response.call_on_close(limits.recycle_worker)
+    return response, 422
+
+# Recycle gunicorn workers whose memory has grown past the configured RSS limit,
+# once the response has been sent (no-op under the Flask dev server)
+@app.after_request
+def check_worker_rss(response):
+    if limits.worker_over_rss_limit():
+        response.call_on_close(limits.recycle_worker)
+    return response
+
 @app.route('/classify_file', methods=['POST'])
 def classify_file_route():
     logger.debug("Received classify_file request")
@@ -40,8 +91,15 @@ def classify_file_route():
         return jsonify({"error": f"Unsupported method: {method}"}), 400
 
     try:
-        result = classify_file(file, method=method)
+        deadline = parse_deadline(request.form.get('deadline'))
+    except ValueError:
+        return jsonify({"error": "Invalid deadline"}), 400
+
+    try:
+        result = classify_file(file, method=method, deadline=deadline)
         return jsonify({"file_class": result}), 200
+    except (ResourceLimitExceeded, UnsupportedFileType, MemoryError):
+        raise
     except Exception as e:
         logger.error(f"Classification error: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
@@ -55,11 +113,21 @@ def classify_by_path():
     if not path or not os.path.exists(path):
         return jsonify({"error": "Invalid or missing path"}), 400
 
+    try:
+        deadline = parse_deadline(data.get("deadline"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid deadline"}), 400
+
+    if limits.MAX_UPLOAD_BYTES and os.path.getsize(path) > limits.MAX_UPLOAD_BYTES:
+        return jsonify({"error": f"File exceeds {limits.MAX_UPLOAD_BYTES} bytes"}), 413
+
     try:
         with open(path, "rb") as f:
             file = FileStorage(stream=f, filename=os.path.basename(path))
-            result = classify_file(file, method=method)
+            result = classify_file(file, method=method, deadline=deadline)
             return jsonify({"file_class": result})
+    except (ResourceLimitExceeded, UnsupportedFileType, MemoryError):
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1,3 +1,7 @@
+import atexit
+import contextlib
+import hashlib
+import json
 import os
 import re
 import tempfile
@@ -7,20 +11,92 @@ import requests
 from dotenv import load_dotenv
 from werkzeug.datastructures import FileStorage
 from src.extractor import extract_text
+from src.deadline import Deadline, DeadlineExceeded
+from src import limits
+from src.limits import ResourceLimitExceeded
+from src.dedup import NearDuplicateIndex
+from src.compact_model import CompactModel
+from src.llm_batcher import LLMBatcher
+from src.sniff import SNIFF_BYTES, SUFFIXES, SniffedUpload, UnsupportedFileType, sniff_type
 
 # Load environment variables
 load_dotenv()
 TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
 TOGETHER_MODEL = "mistralai/Mixtral-8x7B-Instruct-v0.1"
 MODEL_PATH = "model/document_classifier.pkl"
+COMPACT_MODEL_PATH = "model/document_classifier"
 TEMPLATE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "templates"))
 
-# Load trained model
-try:
-    pretrained_model = joblib.load(MODEL_PATH)
-except Exception as e:
-    print(f"Warning: Could not load model at {MODEL_PATH}. Model-based classification may not work.\n{e}")
-    pretrained_model = None
+# End-to-end time budget per classification, and the per-call cap on the Together request
+CLASSIFY_DEADLINE_SECONDS = float(os.getenv("CLASSIFY_DEADLINE_SECONDS", "30"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_MIN_SECONDS = 1.0  # don't start an LLM call with less time than this left
+SAVE_CHUNK_SIZE = 64 * 1024
+
+# LLM micro-batching: identical in-flight texts share a call, distinct ones are packed
+# into one prompt (set LLM_BATCH_MAX_SIZE=1 for single calls with singleflight only)
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "4"))
+LLM_BATCH_MAX_WAIT_MS = float(os.getenv("LLM_BATCH_MAX_WAIT_MS", "50"))
+LLM_BATCH_MAX_CONCURRENCY = int(os.getenv("LLM_BATCH_MAX_CONCURRENCY", "4"))
+
+# Near-duplicate short-circuit (set NEAR_DUP_THRESHOLD=0 to disable)
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.9"))
+NEAR_DUP_MAX_ENTRIES = int(os.getenv("NEAR_DUP_MAX_ENTRIES", "10000"))
+NEAR_DUP_INDEX_PATH = os.getenv("NEAR_DUP_INDEX_PATH", "model/near_duplicates.npz")
+
+# Load trained model, preferring the memory-mapped compact export over the pickle
+def load_pretrained_model():
+    if os.path.exists(COMPACT_MODEL_PATH):
+        try:
+            return CompactModel.load(COMPACT_MODEL_PATH)
+        except Exception as e:
+            print(f"Warning: Could not load compact model at {COMPACT_MODEL_PATH}. Falling back to {MODEL_PATH}.\n{e}")
+    try:
+        return joblib.load(MODEL_PATH)
+    except Exception as e:
+        print(f"Warning: Could not load model at {MODEL_PATH}. Model-based classification may not work.\n{e}")
+        return None
+
+pretrained_model = load_pretrained_model()
+
+# Hash of the artifact the loaded model came from, so labels it produced can be told apart later
+def model_artifact_fingerprint(model) -> str:
+    if model is None:
+        return ""
+    path = os.path.join(COMPACT_MODEL_PATH, "manifest.json") if isinstance(model, CompactModel) else MODEL_PATH
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(SAVE_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except OSError:
+        return ""
+    return digest.hexdigest()
+
+model_fingerprint = model_artifact_fingerprint(pretrained_model)
+
+# Load (or create) the near-duplicate index of previously classified documents
+near_duplicate_index = None
+if NEAR_DUP_THRESHOLD > 0:
+    try:
+        near_duplicate_index = NearDuplicateIndex.load(
+            NEAR_DUP_INDEX_PATH, threshold=NEAR_DUP_THRESHOLD, max_entries=NEAR_DUP_MAX_ENTRIES
+        )
+    except FileNotFoundError:
+        near_duplicate_index = NearDuplicateIndex(threshold=NEAR_DUP_THRESHOLD, max_entries=NEAR_DUP_MAX_ENTRIES)
+    except Exception as e:
+        print(f"Warning: Could not load near-duplicate index at {NEAR_DUP_INDEX_PATH}. Starting empty.\n{e}")
+        near_duplicate_index = NearDuplicateIndex(threshold=NEAR_DUP_THRESHOLD, max_entries=NEAR_DUP_MAX_ENTRIES)
+
+# Persist the near-duplicate index so it survives restarts
+def save_near_duplicate_index():
+    if near_duplicate_index is not None and len(near_duplicate_index):
+        try:
+            near_duplicate_index.save(NEAR_DUP_INDEX_PATH)
+        except Exception as e:
+            print(f"Warning: Could not save near-duplicate index to {NEAR_DUP_INDEX_PATH}.\n{e}")
+
+atexit.register(save_near_duplicate_index)
 
 # Retrieve all available labels from template directory
 def get_all_labels():
@@ -32,6 +108,14 @@ def get_all_labels():
         if fname.endswith(".json")
     ]
 
+# What a namespace's stored labels depend on: the model artifact, or the LLM and its label set.
+# Checked on every lookup, so a new category drops stale LLM entries in every worker
+def index_fingerprint(method: str) -> str:
+    if method == "model":
+        return model_fingerprint
+    labels = json.dumps([TOGETHER_MODEL, sorted(get_all_labels())])
+    return hashlib.sha256(labels.encode("utf-8")).hexdigest()
+
 # Classify based on filename and content patterns
 def classify_by_filename(filename: str, content: str = "") -> str:
     name = filename.lower()
@@ -72,26 +156,18 @@ def classify_by_model(text: str, filename: str = "", model=None) -> dict:
         "confidence": round(confidence, 4)
     }
 
-# Classify using LLM via Together API
-def classify_by_llm(text: str, filename: str = "") -> dict:
+# Check the shared LLM preconditions and return the known labels
+def get_llm_labels() -> list:
     if not TOGETHER_API_KEY:
         raise RuntimeError("TOGETHER_API_KEY is not set in environment.")
 
     labels = get_all_labels()
     if not labels:
         raise RuntimeError("No templates found to determine categories.")
+    return labels
 
-    categories_str = ", ".join(labels)
-    system_message = (
-        f"You are an AI assistant that classifies documents into one of the following categories: "
-        f"{categories_str}. Respond with only one word — the exact label. Do not explain your answer."
-    )
-
-    user_prompt = f"""Document content:
-{text[:4000]}
-
-What is the category?"""
-
+# Send a chat completion request to Together
+def call_together(system_message: str, user_prompt: str, max_tokens: int, deadline: Deadline = None) -> requests.Response:
     payload = {
         "model": TOGETHER_MODEL,
         "messages": [
@@ -99,68 +175,240 @@ What is the category?"""
             {"role": "user", "content": user_prompt}
         ],
         "temperature": 0,
-        "max_tokens": 20,
+        "max_tokens": max_tokens,
     }
 
-    response = requests.post(
-        "https://api.together.xyz/v1/chat/completions",
-        headers={
-            "Authorization": f"Bearer {TOGETHER_API_KEY}",
-            "Content-Type": "application/json"
-        },
-        json=payload
-    )
+    timeout = LLM_TIMEOUT_SECONDS
+    if deadline is not None:
+        if deadline.remaining() < LLM_MIN_SECONDS:
+            raise DeadlineExceeded("llm")
+        timeout = min(timeout, deadline.remaining())
+
+    try:
+        response = requests.post(
+            "https://api.together.xyz/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {TOGETHER_API_KEY}",
+                "Content-Type": "application/json"
+            },
+            json=payload,
+            timeout=timeout
+        )
+    except requests.Timeout as e:
+        raise DeadlineExceeded("llm") from e
 
     print("Together API raw response:", response.text)
+    return response
+
+# Map free-form LLM output onto a known label, or "unknown"
+def normalize_llm_label(content: str, labels: list) -> str:
+    raw_label = content.strip().lower().replace(" ", "_")
+
+    if raw_label in labels:
+        label = raw_label
+    else:
+        match = re.search(r'"([^"]+)"', content)
+        if match:
+            label = match.group(1).strip().lower().replace(" ", "_")
+        else:
+            label = next((lbl for lbl in labels if lbl in content.lower()), "unknown")
 
-    try:
-        content = response.json()["choices"][0]["message"]["content"]
-        print("LLM content:", content)
+    if label not in labels:
+        print(f"Label '{label}' not in known templates: {labels}")
+        label = "unknown"
+    return label
 
-        raw_label = content.strip().lower().replace(" ", "_")
+# Classify using LLM via Together API
+def classify_by_llm(text: str, filename: str = "", deadline: Deadline = None) -> dict:
+    labels = get_llm_labels()
 
-        if raw_label in labels:
-            label = raw_label
-        else:
-            match = re.search(r'"([^"]+)"', content)
-            if match:
-                label = match.group(1).strip().lower().replace(" ", "_")
-            else:
-                label = next((lbl for lbl in labels if lbl in content.lower()), "unknown")
+    categories_str = ", ".join(labels)
+    system_message = (
+        f"You are an AI assistant that classifies documents into one of the following categories: "
+        f"{categories_str}. Respond with only one word — the exact label. Do not explain your answer."
+    )
+
+    user_prompt = f"""Document content:
+{text[:4000]}
+
+What is the category?"""
 
-        if label not in labels:
-            print(f"Label '{label}' not in known templates: {labels}")
-            label = "unknown"
+    response = call_together(system_message, user_prompt, max_tokens=20, deadline=deadline)
 
+    try:
+        content = response.json()["choices"][0]["message"]["content"]
+        print("LLM content:", content)
+        label = normalize_llm_label(content, labels)
     except Exception as e:
         print("Failed to extract label from response:", e)
         label = "unknown"
 
     return {"label": label, "confidence": None}
 
-# Unified classification entrypoint
-def classify_file(file: FileStorage, method: str = "filename", model=None):
-    filename = file.filename
+# Classify several documents with one Together call that answers with a JSON array of labels.
+# Raises ValueError when the response can't be parsed; entries it can't map to a label are None.
+def classify_batch_by_llm(texts: list, deadline: Deadline = None) -> list:
+    labels = get_llm_labels()
 
-    if method == "filename":
-        return {"label": classify_by_filename(filename)}
+    categories_str = ", ".join(labels)
+    system_message = (
+        f"You are an AI assistant that classifies documents into one of the following categories: "
+        f"{categories_str}. You will be given {len(texts)} numbered documents. Respond with only a JSON "
+        f"array of {len(texts)} strings — the exact label of each document, in order. Do not explain your answer."
+    )
 
-    suffix = os.path.splitext(filename)[1]
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        file.save(tmp.name)
-        tmp_path = tmp.name
+    documents = "\n\n".join(
+        f"Document {i + 1} content:\n{text[:4000]}" for i, text in enumerate(texts)
+    )
+    user_prompt = f"""{documents}
 
+What is the category of each document?"""
+
+    response = call_together(system_message, user_prompt, max_tokens=20 * len(texts), deadline=deadline)
     try:
-        text = extract_text(tmp_path).lower()
-    finally:
-        os.remove(tmp_path)
+        content = response.json()["choices"][0]["message"]["content"]
+    except Exception as e:
+        raise ValueError(f"Unexpected LLM batch response: {e}") from e
+    print("LLM batch content:", content)
+
+    match = re.search(r"\[.*\]", content, re.DOTALL)
+    if not match:
+        raise ValueError("LLM batch response did not contain a JSON array.")
+    try:
+        raw_labels = json.loads(match.group(0))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"LLM batch response was not valid JSON: {e}") from e
+    if not isinstance(raw_labels, list) or len(raw_labels) != len(texts):
+        raise ValueError(f"LLM batch response had {len(raw_labels) if isinstance(raw_labels, list) else 'no'} labels for {len(texts)} documents.")
+
+    results = []
+    for raw in raw_labels:
+        label = str(raw).strip().lower().replace(" ", "_")
+        results.append({"label": label, "confidence": None} if label in labels else None)
+    return results
+
+llm_batcher = LLMBatcher(
+    lambda text, deadline: classify_by_llm(text, deadline=deadline),
+    classify_batch_by_llm,
+    max_batch_size=LLM_BATCH_MAX_SIZE,
+    max_wait=LLM_BATCH_MAX_WAIT_MS / 1000,
+    max_concurrency=LLM_BATCH_MAX_CONCURRENCY,
+)
+
+# Classify with the LLM through the batcher, respecting the caller's deadline
+def classify_by_llm_batched(text: str, deadline: Deadline = None) -> dict:
+    if deadline is not None and deadline.remaining() < LLM_MIN_SECONDS:
+        raise DeadlineExceeded("llm")
+    return llm_batcher.classify(text[:4000], deadline)
+
+# Stream the upload to disk in chunks, starting with the already-sniffed head, hashing as it goes.
+# Gives up once the deadline passes or the size limit is hit; returns the SHA-256 hex digest.
+def save_upload(file: FileStorage, path: str, deadline: Deadline, head: bytes = b"") -> str:
+    digest = hashlib.sha256()
+    written = 0
+    with open(path, "wb") as out:
+        chunk = head
+        while True:
+            deadline.check("save")
+            if not chunk:
+                chunk = file.stream.read(SAVE_CHUNK_SIZE)
+                if not chunk:
+                    break
+            written += len(chunk)
+            if limits.MAX_UPLOAD_BYTES and written > limits.MAX_UPLOAD_BYTES:
+                raise ResourceLimitExceeded(f"File exceeds {limits.MAX_UPLOAD_BYTES} bytes", status=413)
+            digest.update(chunk)
+            out.write(chunk)
+            chunk = b""
+    return digest.hexdigest()
+
+# Cheapest available answer once a stage has run out of time: model on partial text, else filename
+def classify_degraded(filename: str, text: str, stage: str) -> dict:
+    if text.strip() and pretrained_model is not None:
+        result = classify_by_model(text, filename, model=pretrained_model)
+        fallback = "model"
+    else:
+        result = {"label": classify_by_filename(filename, text)}
+        fallback = "filename"
+    result["degraded"] = {"stage": stage, "fallback": fallback}
+    return result
+
+# Classify extracted text, reusing a near-duplicate's label when there is one
+def classify_text(text: str, filename: str, method: str, deadline: Deadline = None) -> dict:
+    # Templated documents that differ only in their numbers reuse an earlier label
+    signature = None
+    if near_duplicate_index is not None:
+        near_duplicate_index.set_fingerprint(method, index_fingerprint(method))
+        signature = near_duplicate_index.signature(text)
+    if signature is not None:
+        match = near_duplicate_index.query(text, namespace=method, signature=signature)
+        if match is not None:
+            result, similarity = match
+            result["near_duplicate"] = round(similarity, 4)
+            return result
 
     if method == "model":
         if pretrained_model is None:
             raise RuntimeError("Model not loaded. Ensure 'model/document_classifier.pkl' exists.")
-        return classify_by_model(text, filename, model=pretrained_model)
+        result = classify_by_model(text, filename, model=pretrained_model)
+    else:
+        try:
+            result = classify_by_llm_batched(text, deadline)
+        except DeadlineExceeded as e:
+            return classify_degraded(filename, text, e.stage)
 
-    if method == "llm":
-        return classify_by_llm(text, filename)
+    if signature is not None and result["label"] != "unknown":
+        near_duplicate_index.add(text, result, namespace=method, signature=signature)
+    return result
 
-    raise ValueError(f"Unknown classification method: {method}")
+# Unified classification entrypoint
+def classify_file(file: FileStorage, method: str = "filename", model=None, deadline: Deadline = None):
+    filename = file.filename
+
+    if method == "filename":
+        return {"label": classify_by_filename(filename)}
+
+    if method not in {"model", "llm"}:
+        raise ValueError(f"Unknown classification method: {method}")
+
+    if deadline is None:
+        deadline = Deadline(CLASSIFY_DEADLINE_SECONDS)
+
+    # Route on the content, not the (often wrong) extension, and reject anything unsupported
+    # before a parser sees it. HTTP uploads were already sniffed, hashed and saved while the
+    # request body streamed in (SniffedUpload); other streams are sniffed and saved here.
+    upload = file.stream if isinstance(file.stream, SniffedUpload) else None
+    if upload is not None:
+        kind = upload.kind
+    else:
+        head = file.stream.read(SNIFF_BYTES)
+        kind = sniff_type(head, filename)
+    if kind is None:
+        raise UnsupportedFileType(f"Unsupported file content for '{filename}'. Expected PDF, PNG, JPEG, DOCX or XLSX.")
+
+    if upload is not None:
+        tmp_path, sha256 = upload.path, upload.sha256
+    else:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=SUFFIXES[kind]) as tmp:
+            tmp_path = tmp.name
+        sha256 = None
+
+    # Tells the LLM batcher this request may join a batch once its text is extracted
+    session = llm_batcher.session() if method == "llm" else contextlib.nullcontext()
+    try:
+        with session:
+            if sha256 is None:
+                sha256 = save_upload(file, tmp_path, deadline, head=head)
+            text = extract_text(tmp_path, deadline, kind=kind).lower()
+            result = classify_text(text, filename, method, deadline)
+    except DeadlineExceeded as e:
+        result = classify_degraded(filename, e.partial.lower(), e.stage)
+    finally:
+        # The request deletes a SniffedUpload's temp file when it closes
+        if upload is None:
+            os.remove(tmp_path)
+
+    # The hash is known whenever the upload was fully saved, even if a later stage degraded
+    if sha256 is not None:
+        result["sha256"] = sha256
+    return result
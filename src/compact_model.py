@@ -0,0 +1,229 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import uuid
+import numpy as np
+
+# Compact, memory-mappable export of the TF-IDF + LogisticRegression pipeline.
+# The artifact is a directory holding manifest.json (format version, vectorizer
+# settings, vocabularies, classes) and one uncompressed .npy file per array, so
+# np.load(mmap_mode="r") lets preforked workers share the same pages.
+# Each export writes arrays under new, generation-tagged names and swaps the
+# manifest in last, so files already mapped by running workers are never rewritten.
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+SUPPORTED_DTYPES = {"float32", "float16", "float64"}
+
+# Vectorizer settings the compact predictor knows how to reproduce
+def _vectorizer_config(vectorizer) -> dict:
+    params = vectorizer.get_params()
+    unsupported = {
+        "analyzer": params["analyzer"] != "word",
+        "preprocessor": params["preprocessor"] is not None,
+        "tokenizer": params["tokenizer"] is not None,
+        "stop_words": params["stop_words"] is not None,
+        "strip_accents": params["strip_accents"] is not None,
+    }
+    bad = [name for name, flag in unsupported.items() if flag]
+    if bad:
+        raise ValueError(f"Cannot export vectorizer with custom settings: {', '.join(bad)}")
+
+    return {
+        "lowercase": params["lowercase"],
+        "token_pattern": params["token_pattern"],
+        "ngram_range": list(params["ngram_range"]),
+        "binary": params["binary"],
+        "sublinear_tf": params["sublinear_tf"],
+        "use_idf": params["use_idf"],
+        "norm": params["norm"],
+    }
+
+# Write a fitted sklearn Pipeline (ColumnTransformer of TfidfVectorizers -> LogisticRegression) to a compact artifact
+def export_model(pipeline, path: str, dtype: str = "float32") -> str:
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported dtype: {dtype}")
+
+    features = pipeline.named_steps["features"]
+    clf = pipeline.named_steps["clf"]
+    if getattr(features, "remainder", "drop") != "drop":
+        raise ValueError("Only ColumnTransformers with remainder='drop' can be exported.")
+    if len(clf.classes_) > 2 and getattr(clf, "multi_class", "auto") == "ovr":
+        raise ValueError("Only multinomial LogisticRegression can be exported.")
+
+    arrays = {
+        "coef": clf.coef_.astype(dtype),
+        "intercept": clf.intercept_.astype(dtype),
+    }
+    columns = []
+    for name, vectorizer, column in features.transformers_:
+        if vectorizer == "drop":
+            continue
+        vocabulary = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+        config = _vectorizer_config(vectorizer)
+        config.update({"name": name, "column": column, "vocabulary": vocabulary})
+        if config["use_idf"]:
+            arrays[f"idf_{name}"] = vectorizer.idf_.astype(dtype)
+        columns.append(config)
+
+    generation = uuid.uuid4().hex[:12]
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "dtype": dtype,
+        "classes": [str(c) for c in clf.classes_],
+        "columns": columns,
+        "files": {name: f"{name}.{generation}.npy" for name in arrays},
+    }
+
+    # Build the whole artifact in a temp directory next to the target, then move it in
+    os.makedirs(path, exist_ok=True)
+    previous_files = _manifest_files(path)
+    staging = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".export-")
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, manifest["files"][name]), array)
+        with open(os.path.join(staging, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f)
+
+        for filename in manifest["files"].values():
+            os.replace(os.path.join(staging, filename), os.path.join(path, filename))
+        # The manifest goes last: loaders see either the old generation or the new one
+        os.replace(os.path.join(staging, MANIFEST_NAME), os.path.join(path, MANIFEST_NAME))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    # Keep the previous generation for loaders that read the old manifest just before the swap
+    keep = set(manifest["files"].values()) | previous_files | {MANIFEST_NAME}
+    for filename in os.listdir(path):
+        if filename.endswith(".npy") and filename not in keep:
+            os.remove(os.path.join(path, filename))
+    return path
+
+# Array filenames referenced by the manifest currently in a directory
+def _manifest_files(path: str) -> set:
+    try:
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    return set(_array_files(manifest).values())
+
+# Array name -> filename; artifacts from before generation-tagged names use "<name>.npy"
+def _array_files(manifest: dict) -> dict:
+    names = ["coef", "intercept"] + [
+        f"idf_{c['name']}" for c in manifest["columns"] if c["use_idf"]
+    ]
+    files = manifest.get("files", {})
+    return {name: files.get(name, f"{name}.npy") for name in names}
+
+# Drop-in replacement for the pickled Pipeline's predict_proba/predict/classes_
+class CompactModel:
+    def __init__(self, manifest: dict, arrays: dict):
+        self.classes_ = np.array(manifest["classes"])
+        self.coef = arrays["coef"]
+        self.intercept = arrays["intercept"]
+        self.columns = []
+        offset = 0
+        for config in manifest["columns"]:
+            vocabulary = {term: i for i, term in enumerate(config["vocabulary"])}
+            self.columns.append({
+                **config,
+                "vocabulary": vocabulary,
+                "pattern": re.compile(config["token_pattern"]),
+                "idf": arrays.get(f"idf_{config['name']}"),
+                "offset": offset,
+            })
+            offset += len(vocabulary)
+        self.n_features = offset
+        if self.coef.shape[1] != self.n_features:
+            raise ValueError("Compact model coefficients do not match its vocabularies.")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact model format: {manifest.get('format_version')}")
+
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(path, filename), mmap_mode=mmap_mode, allow_pickle=False)
+            for name, filename in _array_files(manifest).items()
+        }
+        return cls(manifest, arrays)
+
+    # Tokenize and n-gram a document the way sklearn's word analyzer does
+    @staticmethod
+    def _terms(doc: str, column: dict) -> list:
+        if column["lowercase"]:
+            doc = doc.lower()
+        tokens = column["pattern"].findall(doc)
+        low, high = column["ngram_range"]
+        if (low, high) == (1, 1):
+            return tokens
+        terms = []
+        for n in range(low, high + 1):
+            terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    # TF-IDF vector for one document/column, written into its slice of the feature row
+    def _vectorize(self, doc: str, column: dict, row: np.ndarray):
+        counts = {}
+        vocabulary = column["vocabulary"]
+        for term in self._terms(doc, column):
+            idx = vocabulary.get(term)
+            if idx is not None:
+                counts[idx] = counts.get(idx, 0) + 1
+        if not counts:
+            return
+
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if column["binary"]:
+            values[:] = 1.0
+        elif column["sublinear_tf"]:
+            values = np.log(values) + 1.0
+        if column["idf"] is not None:
+            values = values * column["idf"][indices]
+        if column["norm"] == "l2":
+            values = values / np.sqrt(np.dot(values, values))
+        elif column["norm"] == "l1":
+            values = values / np.abs(values).sum()
+        row[column["offset"] + indices] = values
+
+    def transform(self, X) -> np.ndarray:
+        n_rows = len(X[self.columns[0]["column"]]) if self.columns else 0
+        matrix = np.zeros((n_rows, self.n_features), dtype=np.float64)
+        for column in self.columns:
+            for i, doc in enumerate(X[column["column"]]):
+                self._vectorize("" if doc is None else str(doc), column, matrix[i])
+        return matrix
+
+    def decision_function(self, X) -> np.ndarray:
+        return self.transform(X) @ self.coef.T.astype(np.float64) + self.intercept.astype(np.float64)
+
+    def predict_proba(self, X) -> np.ndarray:
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        scores -= scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+# Check that a compact model reproduces the pipeline's predictions on sample inputs
+def verify_model(pipeline, compact: CompactModel, X, atol: float = 1e-6):
+    expected = pipeline.predict_proba(X)
+    actual = compact.predict_proba(X)
+    if list(pipeline.classes_) != list(compact.classes_):
+        raise ValueError("Compact model classes differ from the pipeline.")
+    if not np.array_equal(expected.argmax(axis=1), actual.argmax(axis=1)):
+        raise ValueError("Compact model predictions differ from the pipeline.")
+    max_diff = float(np.abs(expected - actual).max()) if len(expected) else 0.0
+    if max_diff > atol:
+        raise ValueError(f"Compact model probabilities differ from the pipeline by {max_diff:.2e}.")
+    return max_diff
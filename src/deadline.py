@@ -0,0 +1,25 @@
+import time
+
+# Raised when a stage runs out of time; carries whatever partial text was produced
+class DeadlineExceeded(Exception):
+    def __init__(self, stage: str, partial: str = ""):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+        self.partial = partial
+
+# End-to-end time budget threaded through save, extraction, OCR and the LLM call
+class Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    # Raise DeadlineExceeded for the given stage if the budget is spent
+    def check(self, stage: str, partial: str = ""):
+        if self.expired():
+            raise DeadlineExceeded(stage, partial)
@@ -0,0 +1,222 @@
+import fcntl
+import os
+import re
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+
+# MinHash parameters: 128 permutations split into 16 LSH bands of 8 rows,
+# which makes pairs above ~0.7 Jaccard very likely to share a bucket
+NUM_PERM = 128
+NUM_BANDS = 16
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_MAX_ENTRIES = 10000
+MERSENNE_PRIME = np.uint64(4294967291)  # largest prime below 2**32
+INDEX_VERSION = 2  # version 1 files carry no fingerprints
+
+# Split normalized text into overlapping word shingles; digits are masked so
+# the same template filled with different numbers produces the same shingles
+def shingle(text: str, k: int = SHINGLE_SIZE) -> set[str]:
+    words = re.sub(r"\d[\d,.]*", "0", text).split()
+    if len(words) < k:
+        return set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+# Fixed random hash permutations, shared by every signature so they stay comparable
+@lru_cache(maxsize=None)
+def _permutations(num_perm: int, seed: int):
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+    return a, b
+
+# Compute a MinHash signature over a set of shingles
+def minhash(shingles: set[str], num_perm: int = NUM_PERM, seed: int = 1) -> np.ndarray:
+    a, b = _permutations(num_perm, seed)
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+    ) % MERSENNE_PRIME
+    # (a * x + b) stays below 2**64 because a, b and x are all below the 32-bit prime
+    permuted = (np.outer(hashes, a) + b) % MERSENNE_PRIME
+    return permuted.min(axis=0).astype(np.uint32)
+
+# Bounded, persistable MinHash/LSH index mapping near-duplicate documents to labels
+class NearDuplicateIndex:
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 num_perm: int = NUM_PERM, num_bands: int = NUM_BANDS):
+        if num_perm % num_bands != 0:
+            raise ValueError("num_perm must be divisible by num_bands.")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.num_perm = num_perm
+        self.num_bands = num_bands
+        self.rows = num_perm // num_bands
+        # entry id -> (namespace, signature, result); ordered for LRU eviction
+        self.entries = OrderedDict()
+        self.buckets = {}
+        # namespace -> fingerprint of whatever produced its labels (model artifact, label set)
+        self.fingerprints = {}
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _band_keys(self, namespace: str, signature: np.ndarray) -> list:
+        return [
+            (namespace, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.num_bands)
+        ]
+
+    def signature(self, text: str):
+        shingles = shingle(text)
+        if not shingles:
+            return None
+        return minhash(shingles, self.num_perm)
+
+    # Return the stored result of the closest near-duplicate, or None
+    def query(self, text: str, namespace: str = "", signature=None):
+        if signature is None:
+            signature = self.signature(text)
+        if signature is None:
+            return None
+
+        with self.lock:
+            candidates = set()
+            for key in self._band_keys(namespace, signature):
+                candidates |= self.buckets.get(key, set())
+
+            best_id, best_similarity = None, 0.0
+            for entry_id in candidates:
+                similarity = float(np.mean(self.entries[entry_id][1] == signature))
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None or best_similarity < self.threshold:
+                return None
+            self.entries.move_to_end(best_id)
+            return dict(self.entries[best_id][2]), best_similarity
+
+    # Record a classified document, evicting the least recently used entry when full
+    def add(self, text: str, result: dict, namespace: str = "", signature=None):
+        if signature is None:
+            signature = self.signature(text)
+        if signature is None:
+            return
+
+        with self.lock:
+            entry_id = self.next_id
+            self.next_id += 1
+            self.entries[entry_id] = (namespace, signature, dict(result))
+            for key in self._band_keys(namespace, signature):
+                self.buckets.setdefault(key, set()).add(entry_id)
+
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    # Drop an entry and its bucket memberships (caller holds the lock)
+    def _remove(self, entry_id):
+        namespace, signature, _ = self.entries.pop(entry_id)
+        for key in self._band_keys(namespace, signature):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    # Tie a namespace to what produced its labels; entries recorded under another fingerprint are dropped
+    def set_fingerprint(self, namespace: str, fingerprint: str):
+        with self.lock:
+            if self.fingerprints.get(namespace) == fingerprint:
+                return
+            self.fingerprints[namespace] = fingerprint
+            stale = [entry_id for entry_id, (ns, _, _) in self.entries.items() if ns == namespace]
+            for entry_id in stale:
+                self._remove(entry_id)
+
+    # Persist the index to an .npz file (no pickles). Preforked workers all save at shutdown, so
+    # under a file lock the entries already on disk are merged in (where their fingerprints still
+    # match) rather than the last worker to exit overwriting everyone else's
+    def save(self, path: str):
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with open(path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with self.lock:
+                items = list(self.entries.values())
+                fingerprints = dict(self.fingerprints)
+            try:
+                on_disk = self.load(path)
+            except FileNotFoundError:
+                on_disk = None
+            except Exception:
+                on_disk = None  # unreadable or incompatible: overwrite it
+            if on_disk is not None and (on_disk.num_perm, on_disk.num_bands) == (self.num_perm, self.num_bands):
+                items, fingerprints = self._merge(on_disk, items, fingerprints)
+            self._write(path, items, fingerprints)
+
+    # Combine entries from disk with ours; ours are newer, so they win ties and survive the bound
+    def _merge(self, on_disk, items: list, fingerprints: dict):
+        merged = OrderedDict()
+        for namespace, signature, result in on_disk.entries.values():
+            if namespace in fingerprints and on_disk.fingerprints.get(namespace) != fingerprints[namespace]:
+                continue
+            merged[(namespace, signature.tobytes())] = (namespace, signature, result)
+        for namespace, signature, result in items:
+            key = (namespace, signature.tobytes())
+            merged.pop(key, None)
+            merged[key] = (namespace, signature, result)
+        items = list(merged.values())[-self.max_entries:] if self.max_entries else []
+        return items, {**on_disk.fingerprints, **fingerprints}
+
+    def _write(self, path: str, items: list, fingerprints: dict):
+        directory = os.path.dirname(path) or "."
+        signatures = np.array([sig for _, sig, _ in items], dtype=np.uint32).reshape(-1, self.num_perm)
+        confidences = [r.get("confidence") for _, _, r in items]
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npz")
+        with os.fdopen(fd, "wb") as tmp:
+            np.savez(
+                tmp,
+                version=np.array(INDEX_VERSION),
+                params=np.array([self.num_perm, self.num_bands, self.max_entries]),
+                threshold=np.array(self.threshold),
+                fingerprint_namespaces=np.array(list(fingerprints), dtype=str),
+                fingerprints=np.array(list(fingerprints.values()), dtype=str),
+                namespaces=np.array([ns for ns, _, _ in items], dtype=str),
+                labels=np.array([r["label"] for _, _, r in items], dtype=str),
+                confidences=np.array([np.nan if c is None else c for c in confidences], dtype=np.float64),
+                signatures=signatures,
+            )
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+
+    # Load an index previously written by save()
+    @classmethod
+    def load(cls, path: str, threshold: float = None, max_entries: int = None):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) not in (1, INDEX_VERSION):
+                raise ValueError(f"Unsupported near-duplicate index version: {int(data['version'])}")
+            num_perm, num_bands, saved_max_entries = (int(v) for v in data["params"])
+            index = cls(
+                threshold=float(data["threshold"]) if threshold is None else threshold,
+                max_entries=saved_max_entries if max_entries is None else max_entries,
+                num_perm=num_perm,
+                num_bands=num_bands,
+            )
+            if "fingerprints" in data:
+                index.fingerprints = {
+                    str(ns): str(fp) for ns, fp in zip(data["fingerprint_namespaces"], data["fingerprints"])
+                }
+            for namespace, label, confidence, signature in zip(
+                data["namespaces"], data["labels"], data["confidences"], data["signatures"]
+            ):
+                result = {"label": str(label), "confidence": None if np.isnan(confidence) else float(confidence)}
+                index.add("", result, namespace=str(namespace), signature=signature.copy())
+        return index
@@ -6,51 +6,113 @@ import fitz  # PyMuPDF
 import docx
 import openpyxl
 from PyPDF2 import PdfReader
+from src.deadline import Deadline, DeadlineExceeded
+from src import limits
+from src.limits import ResourceLimitExceeded
 
-# Main text extraction dispatcher based on file extension
-def extract_text(path: str) -> str:
-    ext = os.path.splitext(path)[1].lower()
-
-    if ext == ".pdf":
-        return extract_from_pdf(path)
-    elif ext in [".jpg", ".jpeg", ".png"]:
-        return extract_from_image(path)
-    elif ext == ".docx":
-        return extract_from_docx(path)
-    elif ext == ".xlsx":
-        return extract_from_xlsx(path)
+# Main text extraction dispatcher based on the sniffed type, or the file extension when none is given
+def extract_text(path: str, deadline: Deadline = None, kind: str = None) -> str:
+    if kind is None:
+        kind = os.path.splitext(path)[1].lower().lstrip(".")
+
+    if kind == "pdf":
+        return extract_from_pdf(path, deadline)
+    elif kind in ["jpg", "jpeg", "png"]:
+        return extract_from_image(path, deadline)
+    elif kind == "docx":
+        return extract_from_docx(path, deadline)
+    elif kind == "xlsx":
+        return extract_from_xlsx(path, deadline)
     else:
         return ""
 
-# Extract text from PDF using PyMuPDF or PyPDF2 fallback
-def extract_from_pdf(path: str) -> str:
+# Only the first MAX_PDF_PAGES pages are extracted; the classifiers only look at the opening text anyway
+def pdf_pages(pages):
+    if limits.MAX_PDF_PAGES and len(pages) > limits.MAX_PDF_PAGES:
+        return (pages[i] for i in range(limits.MAX_PDF_PAGES))
+    return pages
+
+# Open an image without decoding it, rejecting decompression bombs and downsampling oversized scans
+def open_image(path: str) -> Image.Image:
+    try:
+        img = Image.open(path)
+    except Image.DecompressionBombError as e:
+        raise ResourceLimitExceeded(f"Image is too large to decode: {e}") from e
+
+    width, height = img.size
+    pixels = width * height
+    if limits.MAX_DECODE_PIXELS and pixels > limits.MAX_DECODE_PIXELS:
+        raise ResourceLimitExceeded(
+            f"Image has {pixels} pixels ({width}x{height}); the limit is {limits.MAX_DECODE_PIXELS}"
+        )
+
+    if limits.MAX_IMAGE_PIXELS and pixels > limits.MAX_IMAGE_PIXELS:
+        scale = (limits.MAX_IMAGE_PIXELS / pixels) ** 0.5
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        # draft() lets JPEG decode straight at reduced scale; other formats are resized after decoding
+        img.draft("RGB", size)
+        img.thumbnail(size)
+    return img
+
+# Extract text from PDF using PyMuPDF or PyPDF2 fallback, page by page so a deadline can stop early
+def extract_from_pdf(path: str, deadline: Deadline = None) -> str:
+    pages = []
     try:
         reader = PdfReader(path)
-        return "\n".join(page.extract_text() or "" for page in reader.pages)
+        for page in pdf_pages(reader.pages):
+            if deadline is not None:
+                deadline.check("pdf", "\n".join(pages))
+            pages.append(page.extract_text() or "")
+        return "\n".join(pages)
+    except DeadlineExceeded:
+        raise
     except Exception:
+        pages = []
         doc = fitz.open(path)
-        return "\n".join(page.get_text() for page in doc)
+        for page in pdf_pages(doc):
+            if deadline is not None:
+                deadline.check("pdf", "\n".join(pages))
+            pages.append(page.get_text())
+        return "\n".join(pages)
 
-# Extract text from image using OCR
-def extract_from_image(path: str) -> str:
-    img = Image.open(path)
-    return pytesseract.image_to_string(img)
+# Extract text from image using OCR; the tesseract subprocess is killed if it outlives the deadline
+def extract_from_image(path: str, deadline: Deadline = None) -> str:
+    img = open_image(path)
+    if deadline is None:
+        return pytesseract.image_to_string(img)
+
+    # pytesseract treats a timeout of 0 as "no timeout", so only ever pass a positive one
+    timeout = deadline.remaining()
+    if timeout <= 0:
+        raise DeadlineExceeded("ocr")
+    try:
+        return pytesseract.image_to_string(img, timeout=timeout)
+    except RuntimeError as e:
+        if "timeout" not in str(e).lower():
+            raise
+        raise DeadlineExceeded("ocr") from e
 
 # Extract text from DOCX file
-def extract_from_docx(path: str) -> str:
+def extract_from_docx(path: str, deadline: Deadline = None) -> str:
     doc = docx.Document(path)
+    if deadline is not None:
+        deadline.check("docx")
     return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
 
 # Extract text from XLSX file
-def extract_from_xlsx(path: str) -> str:
+def extract_from_xlsx(path: str, deadline: Deadline = None) -> str:
+    text = []
     try:
         wb = openpyxl.load_workbook(path, data_only=True)
-        text = []
         for sheet in wb.worksheets:
             for row in sheet.iter_rows(values_only=True):
+                if deadline is not None:
+                    deadline.check("xlsx", "\n".join(text))
                 line = " ".join(str(cell) for cell in row if cell)
                 if line.strip():
                     text.append(line)
         return "\n".join(text)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         return f"Error reading Excel file: {e}"
@@ -0,0 +1,64 @@
+import logging
+import os
+import resource
+import signal
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Resource guards, configurable via environment (0 disables the corresponding guard)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", "25000000"))  # larger images are downsampled for OCR
+MAX_DECODE_PIXELS = int(os.getenv("MAX_DECODE_PIXELS", str(Image.MAX_IMAGE_PIXELS)))  # larger images are rejected
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "50"))  # later pages are not extracted
+WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", "0"))  # gunicorn only: recycle worker after the response
+WORKER_MAX_MEMORY_MB = int(os.getenv("WORKER_MAX_MEMORY_MB", "0"))  # gunicorn only: RLIMIT_AS per worker
+
+# Pillow refuses images past its own process-wide limit before our check runs; make that limit
+# follow MAX_DECODE_PIXELS so raising (or disabling) the setting actually takes effect
+Image.MAX_IMAGE_PIXELS = MAX_DECODE_PIXELS or None
+
+# Raised when an input exceeds a configured resource guard
+class ResourceLimitExceeded(Exception):
+    def __init__(self, message: str, status: int = 422):
+        super().__init__(message)
+        self.status = status
+
+# Set by the gunicorn post_fork hook (gunicorn.conf.py). Recycling by signal is only safe inside a
+# gunicorn worker, where SIGTERM means "finish the current request, exit, and be respawned"
+under_gunicorn_worker = False
+
+# Called in each freshly forked gunicorn worker: enables RSS recycling and caps its address space
+# so a runaway allocation raises MemoryError inside the request instead of waking the OOM killer
+def enable_worker_guards():
+    global under_gunicorn_worker
+    under_gunicorn_worker = True
+    if WORKER_MAX_MEMORY_MB:
+        limit = WORKER_MAX_MEMORY_MB * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+# Current resident set size of this process, in bytes (None if unavailable)
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+# Whether this gunicorn worker has grown past WORKER_MAX_RSS_MB and should be recycled
+def worker_over_rss_limit() -> bool:
+    if not under_gunicorn_worker or not WORKER_MAX_RSS_MB:
+        return False
+    rss = current_rss_bytes()
+    if rss is None or rss <= WORKER_MAX_RSS_MB * 1024 * 1024:
+        return False
+    logger.warning(f"Worker {os.getpid()} RSS {rss // (1024 * 1024)}MB exceeds {WORKER_MAX_RSS_MB}MB; recycling")
+    return True
+
+# Ask gunicorn to retire this worker gracefully; a no-op outside a gunicorn worker
+def recycle_worker():
+    if under_gunicorn_worker:
+        os.kill(os.getpid(), signal.SIGTERM)
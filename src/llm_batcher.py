@@ -0,0 +1,159 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from src.deadline import Deadline, DeadlineExceeded
+
+# One distinct in-flight text, shared by every caller that asked for it
+class _Pending:
+    def __init__(self, key: str, text: str, deadline: Deadline = None):
+        self.key = key
+        self.text = text
+        self.future = Future()
+        self.deadlines = [deadline]
+
+    # The call is worth making for as long as any of its callers is still waiting
+    def deadline(self):
+        if any(deadline is None for deadline in self.deadlines):
+            return None
+        return max(self.deadlines, key=lambda deadline: deadline.expires_at)
+
+# Micro-batching front for LLM classification.
+# Concurrent requests for the same text share one in-flight call (singleflight),
+# and distinct texts arriving within max_wait are packed into one batched call.
+# Requests announce themselves with session() before their slow stages (upload, extraction),
+# so a batch is only held open while another request could still join it.
+class LLMBatcher:
+    def __init__(self, classify_one, classify_many, max_batch_size: int = 4, max_wait: float = 0.05,
+                 max_concurrency: int = 4):
+        # classify_one(text, deadline) -> result dict; classify_many(texts, deadline) -> list of
+        # result dicts or None, raising ValueError when the batched response can't be parsed at all
+        self.classify_one = classify_one
+        self.classify_many = classify_many
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.max_concurrency = max_concurrency
+        self.inflight = {}
+        self.pending = []
+        self.active = 0  # open sessions: requests that may still call classify()
+        self.waiting = 0  # callers inside classify()
+        self.cond = threading.Condition()
+        self.collector = None
+        self.pool = None
+
+    # Mark a request that may classify with the LLM shortly
+    @contextmanager
+    def session(self):
+        with self.cond:
+            self.active += 1
+        try:
+            yield self
+        finally:
+            with self.cond:
+                self.active -= 1
+                self.cond.notify_all()
+
+    # Classify text, joining an identical in-flight call or the next batch. A joiner's deadline
+    # extends the shared call's, so it isn't cut short by an earlier caller's tighter budget
+    def classify(self, text: str, deadline: Deadline = None) -> dict:
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self.cond:
+            self.waiting += 1
+            item = self.inflight.get(key)
+            if item is None:
+                item = _Pending(key, text, deadline)
+                self.inflight[key] = item
+                self.pending.append(item)
+                self._start()
+            else:
+                item.deadlines.append(deadline)
+            self.cond.notify_all()
+
+        try:
+            result = item.future.result(timeout=deadline.remaining() if deadline is not None else None)
+        except FutureTimeoutError as e:
+            raise DeadlineExceeded("llm") from e
+        finally:
+            with self.cond:
+                self.waiting -= 1
+        return dict(result)
+
+    # Threads are started lazily so each forked worker gets its own
+    def _start(self):
+        if self.collector is None or not self.collector.is_alive():
+            self.pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm-batch")
+            self.collector = threading.Thread(target=self._collect, name="llm-batch-collector", daemon=True)
+            self.collector.start()
+
+    # Gather pending texts into batches of up to max_batch_size, waiting at most max_wait for
+    # stragglers, and not at all when every open session is already waiting on a result
+    def _collect(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                flush_at = time.monotonic() + self.max_wait
+                while len(self.pending) < self.max_batch_size and self.active > self.waiting:
+                    remaining = flush_at - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                batch = self.pending[:self.max_batch_size]
+                del self.pending[:self.max_batch_size]
+            self.pool.submit(self._run, batch)
+
+    # The call is worth making for as long as any caller in the batch is still waiting
+    def _batch_deadline(self, batch: list):
+        with self.cond:
+            deadlines = [item.deadline() for item in batch]
+        if any(deadline is None for deadline in deadlines):
+            return None
+        return max(deadlines, key=lambda deadline: deadline.expires_at)
+
+    def _run(self, batch: list):
+        deadline = self._batch_deadline(batch)
+        if len(batch) == 1:
+            self._run_single(batch[0], deadline)
+            return
+
+        try:
+            results = self.classify_many([item.text for item in batch], deadline)
+        except ValueError as e:
+            print(f"LLM batch of {len(batch)} could not be parsed, falling back to single calls: {e}")
+            results = [None] * len(batch)
+        except Exception as e:
+            for item in batch:
+                self._finish(item, e, deadline)
+            return
+
+        # Documents the batch couldn't label get their own call, in parallel
+        for item, result in zip(batch, results):
+            if result is None:
+                self.pool.submit(self._run_single, item, deadline)
+            else:
+                self._finish(item, result, deadline)
+
+    def _run_single(self, item: _Pending, deadline: Deadline = None):
+        try:
+            outcome = self.classify_one(item.text, deadline)
+        except Exception as e:
+            outcome = e
+        self._finish(item, outcome, deadline)
+
+    def _finish(self, item: _Pending, outcome, deadline: Deadline = None):
+        with self.cond:
+            # A caller with more time joined after the call started with a tighter deadline: retry for it
+            latest = item.deadline()
+            if isinstance(outcome, DeadlineExceeded) and deadline is not None and (
+                latest is None or (latest.expires_at > deadline.expires_at and not latest.expired())
+            ):
+                self.pending.append(item)
+                self.cond.notify()
+                return
+            self.inflight.pop(item.key, None)
+        if isinstance(outcome, BaseException):
+            item.future.set_exception(outcome)
+        else:
+            item.future.set_result(outcome)
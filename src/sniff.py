@@ -0,0 +1,122 @@
+import hashlib
+import io
+import os
+import struct
+import tempfile
+
+# Bytes read from the start of an upload to decide its type before anything is written to disk
+SNIFF_BYTES = 64 * 1024
+ZIP_LOCAL_HEADER = b"PK\x03\x04"
+
+# Sniffed type -> file suffix that extract_text routes on
+SUFFIXES = {
+    "pdf": ".pdf",
+    "png": ".png",
+    "jpeg": ".jpg",
+    "docx": ".docx",
+    "xlsx": ".xlsx",
+}
+
+# Raised when upload content is not a type we can extract text from
+class UnsupportedFileType(ValueError):
+    pass
+
+# Names of the zip members whose local headers fall inside the sniffed bytes
+def zip_member_names(head: bytes) -> list[str]:
+    names = []
+    offset = head.find(ZIP_LOCAL_HEADER)
+    while offset != -1 and offset + 30 <= len(head):
+        name_len, extra_len = struct.unpack("<HH", head[offset + 26:offset + 30])
+        name = head[offset + 30:offset + 30 + name_len]
+        if len(name) == name_len:
+            names.append(name.decode("utf-8", errors="replace"))
+        offset = head.find(ZIP_LOCAL_HEADER, offset + 30 + name_len + extra_len)
+    return names
+
+# Tell docx from xlsx by the OOXML parts present in the zip
+def sniff_ooxml(head: bytes):
+    for name in zip_member_names(head):
+        if name.startswith("word/"):
+            return "docx"
+        if name.startswith("xl/"):
+            return "xlsx"
+    return None
+
+# Detect the document type from its first bytes; the filename is only a tiebreak for OOXML zips
+def sniff_type(head: bytes, filename: str = ""):
+    # PDF readers accept the header anywhere in the first 1024 bytes
+    if b"%PDF-" in head[:1024]:
+        return "pdf"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(ZIP_LOCAL_HEADER):
+        kind = sniff_ooxml(head)
+        if kind is not None:
+            return kind
+        # Parts weren't visible in the sniffed bytes; trust an OOXML extension but nothing else
+        ext = os.path.splitext(filename)[1].lower().lstrip(".")
+        if ext in {"docx", "xlsx"}:
+            return ext
+    return None
+
+# Sniff a file already on disk
+def sniff_file(path: str):
+    with open(path, "rb") as f:
+        return sniff_type(f.read(SNIFF_BYTES), os.path.basename(path))
+
+# Target for an uploaded multipart file part (see UploadRequest in app.py). The first SNIFF_BYTES
+# are held in memory and sniffed; supported content then goes to a temp file named for its type,
+# unsupported content is dropped past the head without touching the disk. Every chunk is hashed
+# as it arrives. The temp file is deleted when the request closes its files.
+class SniffedUpload:
+    def __init__(self, filename: str = ""):
+        self.filename = filename or ""
+        self.kind = None
+        self.sniffed = False
+        self.head = bytearray()
+        self.digest = hashlib.sha256()
+        self.file = None
+
+    # Path of the saved upload, or None when the content was not a supported type
+    @property
+    def path(self):
+        return self.file.name if self.kind is not None else None
+
+    @property
+    def sha256(self) -> str:
+        return self.digest.hexdigest()
+
+    def write(self, data: bytes) -> int:
+        self.digest.update(data)
+        if not self.sniffed:
+            self.head += data
+            if len(self.head) >= SNIFF_BYTES:
+                self._sniff()
+        elif self.kind is not None:
+            self.file.write(data)
+        return len(data)
+
+    def _sniff(self):
+        head = bytes(self.head)
+        self.sniffed = True
+        self.head = None
+        self.kind = sniff_type(head[:SNIFF_BYTES], self.filename)
+        if self.kind is None:
+            self.file = io.BytesIO(head[:SNIFF_BYTES])
+        else:
+            self.file = tempfile.NamedTemporaryFile(suffix=SUFFIXES[self.kind])
+            self.file.write(head)
+
+    # The parser seeks back to the start once the part is complete; small uploads are sniffed then
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if not self.sniffed:
+            self._sniff()
+        self.file.flush()
+        return self.file.seek(offset, whence)
+
+    def __getattr__(self, name):
+        if not self.sniffed:
+            self._sniff()
+        return getattr(self.file, name)
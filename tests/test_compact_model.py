@@ -0,0 +1,84 @@
+import os
+import sys
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+# Setup path to import from src/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.compact_model import CompactModel, export_model, verify_model
+
+DOCS = pd.DataFrame([
+    {"filename": "invoice 1", "text": "invoice number amount due total payable"},
+    {"filename": "scan 2", "text": "account summary opening balance closing balance"},
+    {"filename": "dl", "text": "driver license date of birth class expires"},
+    {"filename": "bill", "text": "amount due invoice date net 30"},
+    {"filename": "statement", "text": "bank statement account balance deposits"},
+    {"filename": "id card", "text": "license number height eyes restrictions"},
+])
+LABELS = ["invoice", "bank_statement", "drivers_license"] * 2
+
+
+def train(sublinear_tf=False, ngram_range=(1, 1)):
+    model = Pipeline([
+        ("features", ColumnTransformer(transformers=[
+            ("filename_tfidf", TfidfVectorizer(), "filename"),
+            ("text_tfidf", TfidfVectorizer(sublinear_tf=sublinear_tf, ngram_range=ngram_range), "text"),
+        ])),
+        ("clf", LogisticRegression(max_iter=1000)),
+    ])
+    return model.fit(DOCS, LABELS)
+
+
+# ✅ Compact export predicts the same as the pipeline, memory-mapped
+@pytest.mark.parametrize("sublinear_tf, ngram_range", [(False, (1, 1)), (True, (1, 2))])
+def test_export_matches_pipeline(tmp_path, sublinear_tf, ngram_range):
+    model = train(sublinear_tf, ngram_range)
+    export_model(model, str(tmp_path))
+    compact = CompactModel.load(str(tmp_path))
+
+    assert isinstance(compact.coef, np.memmap)
+    queries = pd.DataFrame([
+        {"filename": "unknown", "text": "please pay the amount due on this invoice"},
+        {"filename": "", "text": ""},
+        {"filename": "bank statement", "text": "Closing BALANCE deposits deposits"},
+    ])
+    verify_model(model, compact, pd.concat([DOCS, queries]))
+    assert list(compact.predict(queries)) == list(model.predict(queries))
+
+# ✅ float16 export keeps labels with reduced precision
+def test_float16_export(tmp_path):
+    model = train()
+    export_model(model, str(tmp_path), dtype="float16")
+    compact = CompactModel.load(str(tmp_path))
+    assert compact.coef.dtype == np.float16
+    verify_model(model, compact, DOCS, atol=1e-3)
+
+# ✅ The shipped compact artifact matches the shipped pickle
+def test_shipped_artifact_matches_pickle():
+    root = os.path.join(os.path.dirname(__file__), "..", "model")
+    pipeline = joblib.load(os.path.join(root, "document_classifier.pkl"))
+    compact = CompactModel.load(os.path.join(root, "document_classifier"))
+    verify_model(pipeline, compact, DOCS)
+
+# ✅ Re-exporting over a loaded artifact leaves the loaded model intact
+def test_reexport_does_not_disturb_loaded_model(tmp_path):
+    model = train()
+    export_model(model, str(tmp_path))
+    loaded = CompactModel.load(str(tmp_path))
+    before = loaded.predict_proba(DOCS)
+
+    retrained = train(sublinear_tf=True, ngram_range=(1, 2))
+    export_model(retrained, str(tmp_path))
+    export_model(retrained, str(tmp_path))
+
+    np.testing.assert_array_equal(loaded.predict_proba(DOCS), before)
+    verify_model(retrained, CompactModel.load(str(tmp_path)), DOCS)
+    # Only the current and previous generations (4 arrays each) are kept on disk
+    assert len([f for f in os.listdir(tmp_path) if f.endswith(".npy")]) == 8
@@ -0,0 +1,91 @@
+import os
+import sys
+from io import BytesIO
+import pytest
+import requests
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+# Setup path to import from src/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import src.classifier as classifier
+from src.deadline import Deadline, DeadlineExceeded
+from src.extractor import extract_from_image
+
+@pytest.fixture
+def no_dedup(mocker):
+    mocker.patch.object(classifier, "near_duplicate_index", None)
+
+
+def upload(filename, data=b"%PDF-1.4 dummy content"):
+    return FileStorage(stream=BytesIO(data), filename=filename)
+
+
+# ✅ An already-spent budget degrades to the filename classifier
+def test_expired_deadline_falls_back_to_filename(no_dedup):
+    result = classifier.classify_file(upload("invoice_42.pdf"), method="llm", deadline=Deadline(0))
+    assert result == {"label": "invoice", "degraded": {"stage": "save", "fallback": "filename"}}
+
+# ✅ A hung Together request degrades to the model on the extracted text
+def test_llm_timeout_falls_back_to_model(mocker, no_dedup):
+    mocker.patch.object(classifier, "TOGETHER_API_KEY", "test-key")
+    mocker.patch.object(classifier, "get_all_labels", return_value=["invoice", "bank_statement"])
+    mocker.patch.object(classifier, "extract_text", return_value="Amount due")
+    mocker.patch.object(classifier, "pretrained_model", object())
+    mocker.patch.object(classifier, "classify_by_model", return_value={"label": "invoice", "confidence": 0.6})
+    post = mocker.patch.object(classifier.requests, "post", side_effect=requests.Timeout)
+
+    result = classifier.classify_file(upload("scan.pdf"), method="llm", deadline=Deadline(5))
+
+    assert result["label"] == "invoice"
+    assert result["degraded"] == {"stage": "llm", "fallback": "model"}
+    assert 0 < post.call_args.kwargs["timeout"] <= 5
+
+# ✅ A tesseract timeout surfaces as DeadlineExceeded for the OCR stage
+def test_ocr_timeout_raises_deadline_exceeded(tmp_path, mocker):
+    path = str(tmp_path / "scan.png")
+    Image.new("RGB", (10, 10), "white").save(path)
+    ocr = mocker.patch("src.extractor.pytesseract.image_to_string", side_effect=RuntimeError("Tesseract process timeout"))
+
+    with pytest.raises(DeadlineExceeded) as exc:
+        extract_from_image(path, Deadline(2))
+    assert exc.value.stage == "ocr"
+    assert 0 < ocr.call_args.kwargs["timeout"] <= 2
+
+# ✅ Client deadlines must be finite and are capped at the server default
+@pytest.mark.parametrize("value", ["inf", "nan", "-1", "0", "soon"])
+def test_parse_deadline_rejects_invalid(value):
+    from src.app import parse_deadline
+    with pytest.raises(ValueError):
+        parse_deadline(value)
+
+def test_parse_deadline_capped():
+    from src.app import parse_deadline
+    assert parse_deadline("1e12").seconds == classifier.CLASSIFY_DEADLINE_SECONDS
+    assert parse_deadline("2.5").seconds == 2.5
+
+# ✅ A spent budget never reaches tesseract as an unbounded timeout of 0
+def test_ocr_not_started_without_time_left(tmp_path, mocker):
+    path = str(tmp_path / "scan.png")
+    Image.new("RGB", (10, 10), "white").save(path)
+    deadline = Deadline(60)
+    mocker.patch.object(deadline, "remaining", return_value=0.0)
+    ocr = mocker.patch("src.extractor.pytesseract.image_to_string")
+
+    with pytest.raises(DeadlineExceeded):
+        extract_from_image(path, deadline)
+    ocr.assert_not_called()
+
+# ✅ Results degraded after the upload was saved still carry its hash
+def test_degraded_after_save_includes_sha256(mocker, no_dedup):
+    import hashlib
+    data = b"%PDF-1.4 dummy content"
+    mocker.patch.object(classifier, "extract_text", side_effect=DeadlineExceeded("pdf", "invoice amount due"))
+    mocker.patch.object(classifier, "pretrained_model", None)
+
+    result = classifier.classify_file(upload("scan.pdf", data), method="llm", deadline=Deadline(5))
+
+    assert result["degraded"] == {"stage": "pdf", "fallback": "filename"}
+    assert result["label"] == "invoice"
+    assert result["sha256"] == hashlib.sha256(data).hexdigest()
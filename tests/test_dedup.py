@@ -0,0 +1,147 @@
+import os
+import sys
+
+# Setup path to import from src/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.dedup import NearDuplicateIndex
+
+INVOICE = (
+    "invoice number {n} date {d} bill to acme corporation 12 main street springfield "
+    "description consulting services quantity 1 unit price {p} subtotal {p} tax {t} "
+    "total payable {p} amount due within 30 days thank you for your business"
+)
+STATEMENT = (
+    "first national bank account statement period ending account holder jane doe "
+    "opening balance deposits withdrawals closing balance interest earned fees charged"
+)
+
+
+# ✅ Same template with different numbers is a near-duplicate
+def test_near_duplicate_match():
+    index = NearDuplicateIndex(threshold=0.9)
+    index.add(INVOICE.format(n=1001, d="01/02/2024", p="$420.00", t="$12.10"), {"label": "invoice", "confidence": 0.8}, namespace="model")
+
+    match = index.query(INVOICE.format(n=7734, d="11/30/2025", p="$9,981.55", t="$3.99"), namespace="model")
+    assert match is not None
+    result, similarity = match
+    assert result == {"label": "invoice", "confidence": 0.8}
+    assert similarity >= 0.9
+
+    assert index.query(STATEMENT, namespace="model") is None
+    assert index.query(INVOICE.format(n=1, d="1", p="1", t="1"), namespace="llm") is None
+
+# ✅ Empty text is never indexed or matched
+def test_empty_text_ignored():
+    index = NearDuplicateIndex()
+    index.add("", {"label": "invoice"})
+    assert len(index) == 0
+    assert index.query("") is None
+
+# ✅ Index is bounded and evicts least recently used entries
+def test_bounded_eviction():
+    index = NearDuplicateIndex(max_entries=1)
+    index.add(INVOICE.format(n=1, d="1", p="1", t="1"), {"label": "invoice"})
+    index.add(STATEMENT, {"label": "bank_statement"})
+    assert len(index) == 1
+    assert index.query(INVOICE.format(n=2, d="2", p="2", t="2")) is None
+    assert index.query(STATEMENT)[0]["label"] == "bank_statement"
+
+# ✅ Index round-trips through save/load
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = NearDuplicateIndex(threshold=0.85)
+    index.add(STATEMENT, {"label": "bank_statement", "confidence": None}, namespace="llm")
+    index.save(path)
+
+    loaded = NearDuplicateIndex.load(path)
+    assert loaded.threshold == 0.85
+    assert loaded.query(STATEMENT, namespace="llm")[0] == {"label": "bank_statement", "confidence": None}
+
+# ✅ classify_file returns a near-duplicate's label without calling the model
+def test_classify_file_short_circuits(mocker):
+    from io import BytesIO
+    from werkzeug.datastructures import FileStorage
+    import src.classifier as classifier
+
+    mocker.patch.object(classifier, "near_duplicate_index", NearDuplicateIndex())
+    mocker.patch.object(classifier, "pretrained_model", object())
+    texts = iter([INVOICE.format(n=1, d="1", p="1", t="1"), INVOICE.format(n=2, d="2", p="2", t="2")])
+    mocker.patch.object(classifier, "extract_text", side_effect=lambda path, deadline=None, kind=None: next(texts))
+    model = mocker.patch.object(classifier, "classify_by_model", return_value={"label": "invoice", "confidence": 0.7})
+
+    first = classifier.classify_file(FileStorage(stream=BytesIO(b"%PDF-1.4 a"), filename="a.pdf"), method="model")
+    second = classifier.classify_file(FileStorage(stream=BytesIO(b"%PDF-1.4 b"), filename="b.pdf"), method="model")
+
+    assert first["label"] == "invoice" and first["confidence"] == 0.7
+    assert second["label"] == "invoice" and second["near_duplicate"] >= 0.9
+    assert model.call_count == 1
+
+# ✅ Concurrent saves to the same path each leave a complete index behind
+def test_concurrent_saves(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    path = str(tmp_path / "index.npz")
+    index = NearDuplicateIndex()
+    index.add(STATEMENT, {"label": "bank_statement", "confidence": None})
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: index.save(path), range(16)))
+
+    assert sorted(os.listdir(tmp_path)) == ["index.npz", "index.npz.lock"]
+    assert NearDuplicateIndex.load(path).query(STATEMENT)[0]["label"] == "bank_statement"
+
+# ✅ Entries recorded under another fingerprint are dropped, in-process and after a reload
+def test_fingerprint_mismatch_discards_namespace(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = NearDuplicateIndex()
+    index.set_fingerprint("model", "model-v1")
+    index.set_fingerprint("llm", "labels-v1")
+    index.add(STATEMENT, {"label": "bank_statement", "confidence": 0.9}, namespace="model")
+    index.add(STATEMENT, {"label": "bank_statement", "confidence": None}, namespace="llm")
+    index.save(path)
+
+    loaded = NearDuplicateIndex.load(path)
+    loaded.set_fingerprint("model", "model-v2")
+    loaded.set_fingerprint("llm", "labels-v1")
+    assert loaded.query(STATEMENT, namespace="model") is None
+    assert loaded.query(STATEMENT, namespace="llm")[0]["label"] == "bank_statement"
+
+    loaded.set_fingerprint("llm", "labels-v2")
+    assert len(loaded) == 0
+
+# ✅ Workers saving to the same path merge their entries instead of the last one winning
+def test_save_merges_with_index_on_disk(tmp_path):
+    path = str(tmp_path / "index.npz")
+    first, second = NearDuplicateIndex(), NearDuplicateIndex()
+    for index in (first, second):
+        index.set_fingerprint("model", "model-v1")
+    first.add(STATEMENT, {"label": "bank_statement", "confidence": 0.9}, namespace="model")
+    second.add(INVOICE.format(n=1, d="1", p="1", t="1"), {"label": "invoice", "confidence": 0.8}, namespace="model")
+    first.save(path)
+    second.save(path)
+
+    loaded = NearDuplicateIndex.load(path)
+    assert len(loaded) == 2
+    assert loaded.query(STATEMENT, namespace="model")[0]["label"] == "bank_statement"
+
+    # An index built against a different model does not pull the old entries back in
+    third = NearDuplicateIndex()
+    third.set_fingerprint("model", "model-v2")
+    third.add(STATEMENT, {"label": "statement", "confidence": 0.7}, namespace="model")
+    third.save(path)
+    assert len(NearDuplicateIndex.load(path)) == 1
+
+# ✅ Adding a category drops near-duplicates the LLM labelled against the old label set
+def test_label_change_clears_llm_entries(mocker):
+    import src.classifier as classifier
+
+    mocker.patch.object(classifier, "near_duplicate_index", NearDuplicateIndex())
+    labels = mocker.patch.object(classifier, "get_all_labels", return_value=["invoice", "bank_statement"])
+    llm = mocker.patch.object(classifier, "classify_by_llm_batched", return_value={"label": "bank_statement", "confidence": None})
+
+    classifier.classify_text(STATEMENT, "a.pdf", "llm")
+    assert "near_duplicate" in classifier.classify_text(STATEMENT, "b.pdf", "llm")
+
+    labels.return_value = ["invoice", "bank_statement", "tax_return"]
+    assert "near_duplicate" not in classifier.classify_text(STATEMENT, "c.pdf", "llm")
+    assert llm.call_count == 2
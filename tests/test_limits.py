@@ -0,0 +1,111 @@
+import os
+import struct
+import sys
+import zlib
+from io import BytesIO
+import pytest
+from PIL import Image
+from reportlab.pdfgen import canvas
+
+# Setup path to import from src/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src import limits
+from src.app import app
+from src.extractor import extract_from_image, extract_from_pdf
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+# Build a PNG whose header claims the given size but whose data is a few bytes
+def bomb_png(width, height):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(b"\x00")) + chunk(b"IEND", b"")
+
+
+# ✅ Uploads over MAX_CONTENT_LENGTH are rejected with 413
+def test_upload_too_large(client, mocker):
+    mocker.patch.dict(app.config, {"MAX_CONTENT_LENGTH": 1024})
+    classify = mocker.patch('src.app.classify_file')
+    data = {'file': (BytesIO(b"x" * 4096), 'file.pdf'), 'method': 'model'}
+    response = client.post('/classify_file', data=data, content_type='multipart/form-data')
+    assert response.status_code == 413
+    assert "error" in response.get_json()
+    classify.assert_not_called()
+
+# ✅ Decompression-bomb images are rejected with 422 before decoding
+def test_decompression_bomb_rejected(client):
+    data = {'file': (BytesIO(bomb_png(50000, 50000)), 'scan.png'), 'method': 'model'}
+    response = client.post('/classify_file', data=data, content_type='multipart/form-data')
+    assert response.status_code == 422
+    assert "pixels" in response.get_json()["error"]
+
+# ✅ MAX_DECODE_PIXELS also sets Pillow's own limit, so it can be raised past Pillow's default
+def test_decode_limit_applies_to_pillow(tmp_path):
+    import subprocess
+    path = tmp_path / "big.png"
+    path.write_bytes(bomb_png(15000, 15000))  # over twice Pillow's default, which it refuses outright
+    script = (
+        "import sys; from src import limits; from PIL import Image; "
+        "print(Image.MAX_IMAGE_PIXELS, Image.open(sys.argv[1]).size)"
+    )
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    env = {**os.environ, "MAX_DECODE_PIXELS": "300000000"}
+    output = subprocess.run([sys.executable, "-c", script, str(path)], cwd=root, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    assert output.split()[0] == "300000000"
+    assert "(15000, 15000)" in output
+
+# ✅ Oversized images are downsampled rather than rejected
+def test_large_image_downsampled(tmp_path, mocker):
+    mocker.patch.object(limits, "MAX_IMAGE_PIXELS", 2500)
+    path = str(tmp_path / "scan.png")
+    Image.new("RGB", (400, 200), "white").save(path)
+    ocr = mocker.patch("src.extractor.pytesseract.image_to_string", return_value="text")
+
+    assert extract_from_image(path) == "text"
+    width, height = ocr.call_args.args[0].size
+    assert width * height <= 2500
+    assert width / height == pytest.approx(2, rel=0.1)
+
+# ✅ Only the first MAX_PDF_PAGES pages are extracted
+def test_pdf_page_limit(tmp_path, mocker):
+    mocker.patch.object(limits, "MAX_PDF_PAGES", 2)
+    path = str(tmp_path / "long.pdf")
+    c = canvas.Canvas(path)
+    for i in range(5):
+        c.drawString(100, 700, f"page marker {i}")
+        c.showPage()
+    c.save()
+
+    text = extract_from_pdf(path)
+    assert "page marker 1" in text
+    assert "page marker 2" not in text
+
+# ✅ Workers over the RSS limit are recycled, but only under gunicorn
+def test_worker_recycled_over_rss_limit(mocker):
+    mocker.patch.object(limits, "WORKER_MAX_RSS_MB", 1)
+    kill = mocker.patch("src.limits.os.kill")
+
+    mocker.patch.object(limits, "under_gunicorn_worker", False)
+    assert limits.worker_over_rss_limit() is False
+    limits.recycle_worker()
+    kill.assert_not_called()
+
+    mocker.patch.object(limits, "under_gunicorn_worker", True)
+    assert limits.worker_over_rss_limit() is True
+    limits.recycle_worker()
+    kill.assert_called_once()
+
+# ✅ Hitting the worker memory limit returns 422
+def test_memory_error_returns_422(client, mocker):
+    mocker.patch('src.app.classify_file', side_effect=MemoryError)
+    data = {'file': (BytesIO(b"%PDF-1.4"), 'file.pdf'), 'method': 'model'}
+    response = client.post('/classify_file', data=data, content_type='multipart/form-data')
+    assert response.status_code == 422
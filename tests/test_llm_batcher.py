@@ -0,0 +1,156 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+# Setup path to import from src/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import src.classifier as classifier
+from src.deadline import Deadline, DeadlineExceeded
+from src.llm_batcher import LLMBatcher
+
+
+def classify_concurrently(batcher, texts):
+    # Every request opens its session before any of them classifies, as concurrent uploads would
+    barrier = threading.Barrier(len(texts))
+    def run(text):
+        with batcher.session():
+            barrier.wait()
+            return batcher.classify(text)
+
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        return list(pool.map(run, texts))
+
+
+# ✅ Identical concurrent texts share one in-flight call
+def test_singleflight():
+    calls = []
+    def classify_one(text, deadline):
+        calls.append(text)
+        time.sleep(0.2)
+        return {"label": "invoice", "confidence": None}
+
+    batcher = LLMBatcher(classify_one, None, max_batch_size=1, max_wait=0)
+    results = classify_concurrently(batcher, ["same text"] * 5)
+
+    assert calls == ["same text"]
+    assert results == [{"label": "invoice", "confidence": None}] * 5
+
+# ✅ Distinct texts within the wait window are packed into one call
+def test_distinct_texts_packed():
+    batches = []
+    def classify_many(texts, deadline):
+        batches.append(list(texts))
+        return [{"label": text.split()[0], "confidence": None} for text in texts]
+
+    batcher = LLMBatcher(None, classify_many, max_batch_size=3, max_wait=1.0)
+    results = classify_concurrently(batcher, ["invoice a", "bank_statement b", "drivers_license c"])
+
+    assert len(batches) == 1 and sorted(batches[0]) == ["bank_statement b", "drivers_license c", "invoice a"]
+    assert [r["label"] for r in results] == ["invoice", "bank_statement", "drivers_license"]
+
+# ✅ A lone request is sent right away instead of waiting out the batch window
+def test_lone_request_not_held():
+    batcher = LLMBatcher(lambda text, deadline: {"label": "invoice", "confidence": None}, None,
+                         max_batch_size=4, max_wait=5.0)
+    start = time.monotonic()
+    with batcher.session():
+        assert batcher.classify("only text")["label"] == "invoice"
+    assert time.monotonic() - start < 1.0
+
+# ✅ The batch is held open only while another request is still on its way
+def test_batch_waits_for_open_sessions():
+    batches = []
+    def classify_many(texts, deadline):
+        batches.append(sorted(texts))
+        return [{"label": text, "confidence": None} for text in texts]
+
+    batcher = LLMBatcher(lambda text, deadline: {"label": text, "confidence": None}, classify_many,
+                         max_batch_size=4, max_wait=5.0)
+    straggler_ready = threading.Event()
+    def straggler():
+        with batcher.session():
+            straggler_ready.set()
+            time.sleep(0.2)  # still extracting text
+            return batcher.classify("bank_statement")
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        late = pool.submit(straggler)
+        straggler_ready.wait()
+        start = time.monotonic()
+        with batcher.session():
+            assert batcher.classify("invoice")["label"] == "invoice"
+        assert late.result()["label"] == "bank_statement"
+
+    assert batches == [["bank_statement", "invoice"]]
+    assert time.monotonic() - start < 1.0
+
+# ✅ Unparseable batch responses fall back to single calls
+def test_parse_failure_falls_back_to_single_calls():
+    singles = []
+    lock = threading.Lock()
+    def classify_one(text, deadline):
+        with lock:
+            singles.append(text)
+        return {"label": text, "confidence": None}
+    def classify_many(texts, deadline):
+        raise ValueError("no JSON array")
+
+    batcher = LLMBatcher(classify_one, classify_many, max_batch_size=2, max_wait=1.0)
+    results = classify_concurrently(batcher, ["invoice", "bank_statement"])
+
+    assert sorted(singles) == ["bank_statement", "invoice"]
+    assert [r["label"] for r in results] == ["invoice", "bank_statement"]
+
+# ✅ A joiner with more time left is served even when the first caller's deadline cuts the call short
+def test_joiner_extends_deadline():
+    calls = []
+    def classify_one(text, deadline):
+        calls.append(deadline.remaining())
+        if deadline.remaining() < 0.5:
+            time.sleep(max(deadline.remaining(), 0))
+            raise DeadlineExceeded("llm")
+        time.sleep(0.3)
+        return {"label": "invoice", "confidence": None}
+
+    batcher = LLMBatcher(classify_one, None, max_batch_size=1, max_wait=0)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(batcher.classify, "same text", Deadline(0.2))
+        time.sleep(0.05)
+        second = pool.submit(batcher.classify, "same text", Deadline(30))
+
+        with pytest.raises(DeadlineExceeded):
+            first.result()
+        assert second.result() == {"label": "invoice", "confidence": None}
+
+    assert len(calls) == 2 and calls[0] < 0.5 and calls[1] > 20
+
+# ✅ Batched prompt responses are parsed into per-document labels
+@pytest.mark.parametrize("content, expected", [
+    ('["invoice", "Bank Statement"]', ["invoice", "bank_statement"]),
+    ('Labels: ["invoice", "pay stub"]', ["invoice", None]),
+])
+def test_classify_batch_by_llm(mocker, content, expected):
+    mocker.patch.object(classifier, "TOGETHER_API_KEY", "test-key")
+    mocker.patch.object(classifier, "get_all_labels", return_value=["invoice", "bank_statement"])
+    response = mocker.Mock(text=content)
+    response.json.return_value = {"choices": [{"message": {"content": content}}]}
+    mocker.patch.object(classifier.requests, "post", return_value=response)
+
+    results = classifier.classify_batch_by_llm(["doc one", "doc two"])
+    assert [r["label"] if r else None for r in results] == expected
+
+# ✅ Wrong-length or malformed batch responses raise ValueError
+@pytest.mark.parametrize("content", ['["invoice"]', "invoice, invoice", '["invoice",'])
+def test_classify_batch_by_llm_unparseable(mocker, content):
+    mocker.patch.object(classifier, "TOGETHER_API_KEY", "test-key")
+    mocker.patch.object(classifier, "get_all_labels", return_value=["invoice", "bank_statement"])
+    response = mocker.Mock(text=content)
+    response.json.return_value = {"choices": [{"message": {"content": content}}]}
+    mocker.patch.object(classifier.requests, "post", return_value=response)
+
+    with pytest.raises(ValueError):
+        classifier.classify_batch_by_llm(["doc one", "doc two"])
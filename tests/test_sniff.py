@@ -0,0 +1,112 @@
+import hashlib
+import os
+import sys
+from io import BytesIO
+import docx
+import openpyxl
+import pytest
+from PIL import Image
+from reportlab.pdfgen import canvas
+from werkzeug.datastructures import FileStorage
+
+# Setup path to import from src/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import src.classifier as classifier
+from src.app import app
+from src.sniff import sniff_type
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+def make_pdf():
+    buf = BytesIO()
+    c = canvas.Canvas(buf)
+    c.drawString(100, 700, "Invoice Number 1001 Amount Due")
+    c.save()
+    return buf.getvalue()
+
+def make_image(fmt):
+    buf = BytesIO()
+    Image.new("RGB", (20, 20), "white").save(buf, format=fmt)
+    return buf.getvalue()
+
+def make_docx():
+    buf = BytesIO()
+    document = docx.Document()
+    document.add_paragraph("Bank Statement account balance")
+    document.save(buf)
+    return buf.getvalue()
+
+def make_xlsx():
+    buf = BytesIO()
+    wb = openpyxl.Workbook()
+    wb.active.append(["Invoice Number", 1001, "Amount Due", 42])
+    wb.save(buf)
+    return buf.getvalue()
+
+
+# ✅ Types are detected from content regardless of the filename
+@pytest.mark.parametrize("data, expected", [
+    (make_pdf(), "pdf"),
+    (make_image("PNG"), "png"),
+    (make_image("JPEG"), "jpeg"),
+    (make_docx(), "docx"),
+    (make_xlsx(), "xlsx"),
+    (b"just some text", None),
+    (b"PK\x03\x04" + b"\x00" * 40, None),
+])
+def test_sniff_type(data, expected):
+    assert sniff_type(data, "misnamed.txt") == expected
+
+# ✅ A mislabeled upload is routed to the parser for its real type and hashed
+def test_mislabeled_upload_routed_by_content(mocker):
+    mocker.patch.object(classifier, "near_duplicate_index", None)
+    mocker.patch.object(classifier, "pretrained_model", object())
+    model = mocker.patch.object(classifier, "classify_by_model", return_value={"label": "invoice", "confidence": 0.9})
+    data = make_xlsx()
+
+    result = classifier.classify_file(FileStorage(stream=BytesIO(data), filename="scan_0042.pdf"), method="model")
+
+    assert "invoice number 1001 amount due 42" in model.call_args.args[0]
+    assert result["sha256"] == hashlib.sha256(data).hexdigest()
+
+# ✅ Unsupported content is rejected with 415 before anything is written to disk
+def test_unsupported_content_rejected(client, mocker):
+    tmp = mocker.patch("src.classifier.tempfile.NamedTemporaryFile")
+    upload_tmp = mocker.patch("src.sniff.tempfile.NamedTemporaryFile")
+    body = b"MZ\x90\x00 not a document" + b"\x00" * (256 * 1024)
+    data = {'file': (BytesIO(body), 'invoice.pdf'), 'method': 'model'}
+    response = client.post('/classify_file', data=data, content_type='multipart/form-data')
+    assert response.status_code == 415
+    assert "Unsupported file content" in response.get_json()["error"]
+    tmp.assert_not_called()
+    upload_tmp.assert_not_called()
+
+# ✅ HTTP uploads are sniffed, hashed and saved once while the body streams in
+def test_upload_saved_while_streaming(client, mocker):
+    mocker.patch.object(classifier, "near_duplicate_index", None)
+    mocker.patch.object(classifier, "pretrained_model", object())
+    mocker.patch.object(classifier, "classify_by_model", return_value={"label": "invoice", "confidence": 0.9})
+    save = mocker.spy(classifier, "save_upload")
+    seen = {}
+
+    def fake_extract(path, deadline=None, kind=None):
+        with open(path, "rb") as f:
+            seen.update(path=path, kind=kind, data=f.read())
+        return "invoice"
+    mocker.patch.object(classifier, "extract_text", side_effect=fake_extract)
+
+    body = make_pdf() + b"%" + os.urandom(200 * 1024)
+    data = {'file': (BytesIO(body), 'scan.bin'), 'method': 'model'}
+    response = client.post('/classify_file', data=data, content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    assert response.get_json()["file_class"]["sha256"] == hashlib.sha256(body).hexdigest()
+    assert seen["kind"] == "pdf" and seen["path"].endswith(".pdf") and seen["data"] == body
+    save.assert_not_called()
+    assert not os.path.exists(seen["path"])